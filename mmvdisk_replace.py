@@ -10,17 +10,19 @@ Revision: 1.0
 
 import json
 import logging
-import smtplib
+import re
 import subprocess
+import sys
 import time
 from datetime import datetime
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
 from logging.handlers import SysLogHandler
 
-import pandas as pd
 from docopt import docopt
-from prettytable import PrettyTable
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Constants
 __version__ = 'Beta 1'
@@ -31,8 +33,15 @@ __deprecated__ = False
 COMMAND_CONFIG = {
     'all_not_ok': ['mmvdisk', 'pdisk', 'list', '--rg', 'all', '--not-ok'],
     'replace': ['mmvdisk', 'pdisk', 'list', '--rg', 'all', '--replace'],
+    'all_details': ['mmvdisk', 'pdisk', 'list', '--rg', 'all', '-L'],
 }
 
+# Pattern matching a single key = value line of mmvdisk -L output
+_KV_RE = re.compile(r'(?m)^[ \t]*([A-Za-z_][\w.]*)[ \t]*=[ \t]*(?:"([^"\n]*)"|([^\n]*?))[ \t]*\r?$')
+
+# Noise mmvdisk prints around its pdisk tables
+_NOISE_RE = re.compile(r'declustered|mmvdisk: A lower priority value means a higher need for replacement\.')
+
 # Email configuration
 EMAIL_CONFIG = {
     'sender_email': "your email address",
@@ -49,6 +58,9 @@ FILE_PATHS = {
     'log': 'logs.log'
 }
 
+# Keep the raw mmvdisk output in the files above for auditing
+DEBUG_DUMP = False
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -62,9 +74,8 @@ logger.setLevel(logging.INFO)
 formatter = logging.Formatter('%(name)s - %(levelname)s - %(message)s')
 logger.addHandler(SysLogHandler())
 
-# Global storage
-list_pdisk = []
-commands = []
+# Cache of pdisk details, filled by fetch_all_pdisk_details
+pdisk_details = None
 
 
 def get_args():
@@ -93,85 +104,139 @@ def get_args():
     return args
 
 
-def get_failed_pdisk(filename, command):
+def get_failed_pdisk(raw_output, command):
     """
-    Get the list of pdisk and recovery group from the output file.
+    Get the list of pdisk and recovery group from the command output.
     
     Args:
-        filename (str): Path to the file containing command output
+        raw_output (bytes): Undecoded output of the command
         command (str): The command that was executed
         
     Returns:
-        pandas.DataFrame: DataFrame containing recovery group and pdisk info
+        list: List of (recovery group, pdisk) tuples
         
     Exits:
         If all disks are OK or no pdisks are marked for replacement
     """
-    with open(filename, 'r') as file:
-        contents = file.read()
+    # Check if all disks are OK, before paying for a decode
+    if b'All pdisks are ok.' in raw_output:
+        print(f"Command: {command} ---> All disk are OK!")
+        logging.info("Command: %s ---> Output: All disk are OK!", command)
+        exit(0)
+
+    # Check if no disks are marked for replacement
+    elif b'No pdisks are marked for replacement.' in raw_output:
+        print(f"Command: {command} ---> No pdisk are marked for replacement!")
+        logging.info("Command: %s ---> Output: No pdisk are marked for replacement!", command)
+        exit(0)
+
+    rows = []
+    group_index = pdisk_index = None
+
+    for line in clean_lines(raw_output.decode('utf-8')):
+        if not line.strip() or '-----' in line:
+            continue
 
-        # Check if all disks are OK
-        if 'All pdisks are ok.' in contents:
-            print(f"Command: {command} ---> All disk are OK!")
-            logging.info(f"Command: {command} ---> Output: All disk are OK!")
-            exit(0)
+        # Locate the columns of interest from the header line
+        if group_index is None:
+            if 'recovery group' in line and 'pdisk' in line:
+                columns = re.split(r'\s{2,}', line.strip())
+                group_index = columns.index('recovery group')
+                pdisk_index = columns.index('pdisk')
+            continue
+
+        # Skip trailers and stray messages that are not table rows
+        fields = line.split()
+        if len(fields) <= max(group_index, pdisk_index):
+            continue
 
-        # Check if no disks are marked for replacement
-        elif 'No pdisks are marked for replacement.' in contents:
-            print(f"Command: {command} ---> No pdisk are marked for replacement!")
-            logging.info(f"Command: {command} ---> Output: No pdisk are marked for replacement!")
-            exit(0)
+        rows.append((fields[group_index], fields[pdisk_index]))
 
-        # Clean up the contents for better parsing
-        if 'declustered' in contents:
-            contents = contents.replace('declustered', '')
+    return rows
 
-        if 'mmvdisk: A lower priority value means a higher need for replacement.' in contents:
-            contents = contents.replace('mmvdisk: A lower priority value means a higher need for replacement.', '')
 
-    # Write the cleaned contents back to the file
-    with open(filename, 'w') as file:
-        file.write(contents)
+def clean_lines(text):
+    """
+    Split the output into lines, removing the noise mmvdisk adds around
+    its pdisk tables.
+    
+    Args:
+        text (str): Raw command output
+        
+    Returns:
+        list: Lines without the replacement priority note and the
+            'declustered' header label
+    """
+    return _NOISE_RE.sub('', text).splitlines()
+
+
+def render_table(headers, rows):
+    """
+    Render rows as a text table with fixed-width columns.
+    
+    Column widths are computed once from all cells before formatting.
+    
+    Args:
+        headers (list): Column names
+        rows (list): List of rows, each a list of cell values
+        
+    Returns:
+        str: The rendered table
+    """
+    rows = [[str(cell) for cell in row] for row in rows]
+    widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+    fmt = '  '.join('{:<%d}' % width for width in widths)
+    separator = ['-' * width for width in widths]
 
-    # Parse the file with pandas
-    df = pd.read_csv(filename, sep='\s{2,}', engine='python')
-    return df[["recovery group", "pdisk"]]
+    return '\n'.join(fmt.format(*row).rstrip() for row in [headers, separator] + rows)
 
 
-def command(command, filename, table):
+def command(command, filename, table, debug_dump=False):
     """
-    Execute a command and save its output to a file.
+    Execute a command and return its output.
     
     Args:
         command (list): Command to execute as a list of strings
-        filename (str): File to save the output to
+        filename (str): File to save the output to when debug_dump is set
         table (str): Description of what the command does for the table
+        debug_dump (bool): Whether to also write the output to filename
         
     Returns:
-        tuple: (filename, command_string)
+        tuple: (raw_output, command_string), with raw_output as bytes
     """
     command_str = ' '.join([str(elem) for elem in command])
 
-    # Create a pretty table for display
-    t = PrettyTable()
-    t.field_names = ["Command: ", command_str]
-    t.add_row([' ', table])
+    # Create a table for display
+    t = render_table(["Command: ", command_str], [[' ', table]])
     
     try:
-        process = subprocess.Popen(command, stdout=subprocess.PIPE)
-        output, error = process.communicate()
-
-        if error:
-            print(f"Command: {command_str} ---> Error: {error.decode('utf-8')}")
-            exit(1)
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        # Report a failure, but still parse whatever output mmvdisk produced
+        if result.returncode != 0:
+            print(f"Command: {command_str} ---> Error: {result.stderr.decode('utf-8', 'replace')}")
+            if not result.stdout:
+                exit(1)
+
+        # Pass warnings from a successful run through to the terminal
+        elif result.stderr:
+            sys.stderr.buffer.write(result.stderr)
+            sys.stderr.buffer.flush()
             
+        raw_output = result.stdout
         print(t)
-        print(output.decode('utf-8'))
+
+        # Echo the output as bytes; it is only decoded if it gets parsed
+        sys.stdout.flush()
+        sys.stdout.buffer.write(raw_output)
+        sys.stdout.buffer.write(b'\n')
+        sys.stdout.buffer.flush()
         
-        with open(filename, 'w') as f:
-            f.write(output.decode('utf-8'))
+        if debug_dump:
+            with open(filename, 'wb') as f:
+                f.write(raw_output)
         
-        return filename, command_str
+        return raw_output, command_str
     
     except subprocess.CalledProcessError:
         return "Error running command."
@@ -179,34 +244,24 @@ def command(command, filename, table):
         return "Command not found."
 
 
-def show_data(filename, short=False):
+def render_data(data, short=False):
     """
-    Display data from a JSON file in a pretty table.
+    Display pdisk data in a table.
     
     Args:
-        filename (str): JSON file to read
+        data (list): List of pdisk dictionaries
         short (bool): Whether to show a shorter version of the table
     """
-    with open(filename, "r") as f:
-        json_data = f.read()
-
-    data = json.loads(json_data)
-    table = PrettyTable()
-    
     if short:
-        table.field_names = ["Name", "RecoveryGroup", "state", "location", "Server"]
-        for item in data:
-            table.add_row([
-                item["name"],
-                item["recoveryGroup"],
-                item["state"],
-                item["location"],
-                item["server"]
-            ])
+        headers = ["Name", "RecoveryGroup", "state", "location", "Server"]
+        rows = [
+            [item["name"], item["recoveryGroup"], item["state"], item["location"], item["server"]]
+            for item in data
+        ]
     else:
-        table.field_names = ["Name", "RecoveryGroup", "state", "location", "hardware", "User location", "Server"]
-        for item in data:
-            table.add_row([
+        headers = ["Name", "RecoveryGroup", "state", "location", "hardware", "User location", "Server"]
+        rows = [
+            [
                 item["name"],
                 item["recoveryGroup"],
                 item["state"],
@@ -214,9 +269,42 @@ def show_data(filename, short=False):
                 item["hardware"],
                 item["userLocation"],
                 item["server"]
-            ])
+            ]
+            for item in data
+        ]
 
-    print(table)
+    print(render_table(headers, rows))
+
+
+def show_data(filename, short=False):
+    """
+    Display data from a JSON file in a table.
+    
+    Args:
+        filename (str): JSON file to read
+        short (bool): Whether to show a shorter version of the table
+    """
+    with open(filename, "r") as f:
+        render_data(json.load(f), short)
+
+
+def _parse_value(match):
+    """
+    Get the value of a key=value match, converting unquoted integers.
+    
+    Args:
+        match (re.Match): Match of _KV_RE
+        
+    Returns:
+        int or str: Parsed value
+    """
+    quoted, value = match.group(2, 3)
+    if quoted is not None:
+        return quoted
+    digits = value[1:] if value.startswith('-') else value
+    if digits.isdecimal():
+        return int(value)
+    return value
 
 
 def text_to_dict(text):
@@ -229,53 +317,72 @@ def text_to_dict(text):
     Returns:
         dict: Parsed dictionary
     """
-    result_dict = {}
-    
-    if 'pdisk:' in text:
-        text = text.replace('pdisk:', '')
-        
-    for line in text.split("\n"):
-        if not line.strip():  # Skip empty lines
-            continue
-            
-        if '=' not in line:
-            continue
-            
-        key, value = line.split("=", 1)
-        value = value.strip().strip("")
-        key = key.strip()
-        
-        # Try to convert to int if possible
-        try:
-            value = int(value)
-        except ValueError:
-            pass
-            
-        result_dict[key] = value
-        
-    # Clean up string values
-    for key, value in result_dict.items():
-        if isinstance(value, str) and len(value) >= 2 and value[0] == '"' and value[-1] == '"':
-            result_dict[key] = value[1:-1]
-            
-    return result_dict
+    return {match.group(1): _parse_value(match) for match in _KV_RE.finditer(text)}
 
 
 def create_file(filename, data, short_format=False):
     """
-    Create a JSON file with the provided data and display it.
+    Display the provided data and save it to a JSON file.
     
     Args:
         filename (str): File path to write JSON data
         data (list): List of dictionaries to save as JSON
         short_format (bool): Whether to display in short format
     """
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=4)
+    render_data(data, short_format)
+
+    # orjson is optional; fall back to the standard library when missing
+    if orjson is not None:
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(filename, 'w') as f:
+            json.dump(data, f, indent=2)
+
+    
+def _query_pdisk(pdisk, group):
+    """
+    Query the detailed information of a single pdisk.
+    
+    Args:
+        pdisk (str): The pdisk identifier
+        group (str): The recovery group name
         
-    show_data(filename, short_format)
+    Returns:
+        dict: Parsed pdisk information
+    """
+    cmd = ['mmvdisk', 'pdisk', 'list', '--rg', group, '--pdisk', pdisk, '-L']
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, encoding='utf-8')
+    
+    return text_to_dict(result.stdout)
+
 
+def fetch_all_pdisk_details(refresh=False):
+    """
+    Get the detailed information of every pdisk with a single mmvdisk call.
+    
+    The result is cached and reused on later calls.
     
+    Args:
+        refresh (bool): Whether to discard the cache and query mmvdisk again
+        
+    Returns:
+        dict: Parsed pdisk information keyed by (recovery group, pdisk)
+    """
+    global pdisk_details
+
+    if pdisk_details is None or refresh:
+        result = subprocess.run(COMMAND_CONFIG['all_details'], stdout=subprocess.PIPE, encoding='utf-8')
+
+        pdisk_details = {}
+        for block in result.stdout.split('pdisk:'):
+            pdisk_info = text_to_dict(block)
+            if 'recoveryGroup' in pdisk_info and 'name' in pdisk_info:
+                pdisk_details[(pdisk_info['recoveryGroup'], pdisk_info['name'])] = pdisk_info
+
+    return pdisk_details
+
+
 def get_pdisk_info(pdisk, group):
     """
     Get information about a specific pdisk within a recovery group.
@@ -283,47 +390,50 @@ def get_pdisk_info(pdisk, group):
     Args:
         pdisk (str): The pdisk identifier
         group (str): The recovery group name
+        
+    Returns:
+        dict: Parsed pdisk information
     """
-    cmd = ['mmvdisk', 'pdisk', 'list', '--rg', group, '--pdisk', pdisk, '-L']
-    output_proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
-    output, _ = output_proc.communicate()
-    
-    pdisk_info = text_to_dict(output.decode('utf-8'))
-    list_pdisk.append(pdisk_info)
+    pdisk_info = fetch_all_pdisk_details().get((group, pdisk))
+
+    # Fall back to a direct query if the pdisk is missing from the batch
+    if pdisk_info is None:
+        pdisk_info = _query_pdisk(pdisk, group)
+
+    return pdisk_info
 
     
-def replace_pdisk(args, pdisk, group, need_replace):
+def build_replace_command(pdisk, group, prepare=True):
     """
-    Handle pdisk replacement based on provided arguments.
+    Build the command that prepares or replaces a pdisk.
     
     Args:
-        args (dict): Command line arguments
         pdisk (str): The pdisk identifier
         group (str): The recovery group name
-        need_replace (list): List of disks that need replacement
+        prepare (bool): Whether to build the prepare command instead of the
+            replace command
+        
+    Returns:
+        list: Command as a list of strings
+    """
+    if prepare:
+        return ['mmvdisk', 'pdisk', 'replace', '--prepare', '--rg', group, '--pdisk', pdisk]
+    return ['mmvdisk', 'pdisk', 'replace', '--recovery-group', group, '--pdisk', pdisk]
+
+
+def execute_replace(command_parts, prepare=False):
+    """
+    Run a prepare or replace command and report its result.
+    
+    Args:
+        command_parts (list): Command built by build_replace_command
+        prepare (bool): Whether the command prepares the pdisk for replacement
     """
-    # Construct the command
-    command_parts = ['mmvdisk', 'pdisk', 'replace', '--prepare', '--rg', group, '--pdisk', pdisk]
     command_str = ' '.join([str(elem) for elem in command_parts])
-    commands.append(command_str)
-
-    if args['--dryrun']:
-        # Just print the commands without executing
-        print(commands)
-    
-    elif args['--email']:
-        # Send email with disk replacement information
-        send_emails(args['<EMAIL>'], need_replace)
-
-    elif args['--prepare']:
-        # Prepare disks for replacement
-        output_proc = subprocess.Popen(
-            ['mmvdisk', 'pdisk', 'replace', '--prepare', '--rg', group, '--pdisk', pdisk], 
-            stdout=subprocess.PIPE
-        )
-        output, _ = output_proc.communicate()
-        output_text = output.decode('utf-8')
-        
+    result = subprocess.run(command_parts, stdout=subprocess.PIPE, encoding='utf-8')
+    output_text = result.stdout
+
+    if prepare:
         # Check if preparation was successful
         if 'Reinsert carrier.' in output_text:
             success_msg = f"Successfully prepared pdisk for replace!\n Command: {command_str} --> OUTPUT: {output_text}"
@@ -332,124 +442,132 @@ def replace_pdisk(args, pdisk, group, need_replace):
         else:
             error_msg = f"Command: {command_str} --> OUTPUT: {output_text}"
             print(error_msg)
-            logging.info(f"Failed preparing pdisk for replace!\n {error_msg}")
+            logging.info("Failed preparing pdisk for replace!\n %s", error_msg)
 
     else:
-        # Actually replace the pdisk
-        output_proc = subprocess.Popen(
-            ['mmvdisk', 'pdisk', 'replace', '--recovery-group', group, '--pdisk', pdisk], 
-            stdout=subprocess.PIPE
-        )
-        output, _ = output_proc.communicate()
-        output_text = output.decode('utf-8')
-
         if 'not physically replaced with a new disk.' in output_text:
             error_msg = f"Command: {command_str} --> Error: {output_text}"
             print(error_msg)
-            logging.info(f"Failed replacing pdisk! {error_msg}")
+            logging.info("Failed replacing pdisk! %s", error_msg)
         else:
             success_msg = f"Replacing pdisk! Command: {command_str} --> OUTPUT: {output_text}"
             print(success_msg)
             logging.info(success_msg)
 
 
-def send_email(sender_email, sender_password, receiver_email, subject, message):
+class MailSession:
     """
-    Send an email.
+    SMTP session that is opened once and reused for every notification.
     
     Args:
         sender_email (str): Email address of sender
         sender_password (str): Password for sender's email
+    """
+
+    def __init__(self, sender_email, sender_password):
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.smtp = None
+
+    def __enter__(self):
+        # Only needed on the email path, so imported lazily
+        import smtplib
+
+        self.smtp = smtplib.SMTP(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port'])
+        try:
+            self.smtp.starttls()
+            self.smtp.login(self.sender_email, self.sender_password)
+        except Exception:
+            # Do not leave the socket open when the setup fails
+            self.smtp.close()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        import smtplib
+
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            # The connection is already gone, just release the socket
+            self.smtp.close()
+
+    def send_message(self, msg):
+        """
+        Send a message over the open session.
+        
+        Args:
+            msg (email.message.Message): Message to send
+        """
+        self.smtp.send_message(msg)
+
+
+def send_email(session, receiver_email, subject, message):
+    """
+    Send an email.
+    
+    Args:
+        session (MailSession): Open SMTP session
         receiver_email (str): Email address of recipient
         subject (str): Email subject
         message (str): Email body
     """
+    # MIME support is not loaded unless an email is sent
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
     # Create a multipart message
     msg = MIMEMultipart()
-    msg["From"] = sender_email
+    msg["From"] = session.sender_email
     msg["To"] = receiver_email
     msg["Subject"] = subject
 
     # Add the message body
     msg.attach(MIMEText(message, "plain"))
 
-    # Create SMTP session for sending the mail
-    with smtplib.SMTP(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port']) as smtp:
-        smtp.starttls()
-        smtp.login(sender_email, sender_password)
-        smtp.send_message(msg)
+    session.send_message(msg)
 
 
-def send_emails(receiver_email, need_replace_disk):
+def send_emails(session, receiver_email, need_replace_disk):
     """
-    Send email notification about disks that need replacement.
+    Send one email notification listing every disk that needs replacement.
     
     Args:
+        session (MailSession): Open SMTP session
         receiver_email (str): Email address to send notification to
         need_replace_disk (list): List of disks that need replacement
     """
     name = "Trial1"
     subject = "Disk with issue"
-    message = f"DISKS NEEDS REPLACEMENT! {need_replace_disk} "
-
-    send_email(
-        EMAIL_CONFIG['sender_email'], 
-        EMAIL_CONFIG['sender_password'], 
-        receiver_email, 
-        subject, 
-        message
-    )
+    disk_lines = [
+        f"{disk['name']}  {disk['recoveryGroup']}  {disk['location']}  {disk['server']}"
+        for disk in need_replace_disk
+    ]
+    message = "DISKS NEEDS REPLACEMENT!\n" + "\n".join(disk_lines)
+
+    send_email(session, receiver_email, subject, message)
     print(f"Email sent to {name} ({receiver_email})")
 
-    
 
-def display_state(dataframe, title):
+def display_state(rows, title):
     """
     Display pdisk information in a table and return as JSON data.
     
     Args:
-        dataframe (pandas.DataFrame): DataFrame with pdisk information
+        rows (list): List of (recovery group, pdisk) tuples
         title (str): Title to display above the table
         
     Returns:
         list: JSON data of disk information
     """
-    list_disk = []
-    
-    # Loop through the DataFrame
-    for index, row in dataframe.iterrows():
-        if '--------' not in row['recovery group'] and '--------' not in row['pdisk']:
-            cmd = ['mmvdisk', 'pdisk', 'list', '--rg', row['recovery group'], '--pdisk', row['pdisk'], '-L']
-            output_proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
-            output, _ = output_proc.communicate()
-            
-            # Parse the output into a dictionary
-            disk_info = text_to_dict(output.decode('utf-8'))
-            list_disk.append(disk_info)
-
-    # Convert to JSON for display
-    data_json = json.dumps(list_disk)
-    data = json.loads(data_json)
-    
-    # Create and display the table
-    table = PrettyTable()
-    table.field_names = ["Name", "RecoveryGroup", "state", "location", "hardware", "User location", "Server"]
-
-    for item in data:
-        table.add_row([
-            item["name"],
-            item["recoveryGroup"],
-            item["state"],
-            item["location"],
-            item["hardware"],
-            item["userLocation"],
-            item["server"]
-        ])
-        
+    # Look up every parsed row
+    list_disk = [get_pdisk_info(pdisk, group) for group, pdisk in rows]
+
+    # Display the table
     print(f"{title}")
-    print(table)
+    render_data(list_disk)
 
-    return data
+    return list_disk
 
 
 def main(args):
@@ -464,26 +582,28 @@ def main(args):
     date_stamp = datetime.utcnow().strftime('%Y-%m-%d,%H:%M UTC')
     
     # Get list of disks not OK
-    not_ok_file, command_str = command(
+    not_ok_output, not_ok_command = command(
         COMMAND_CONFIG['all_not_ok'], 
         FILE_PATHS['not_ok_pdisk'], 
-        'Disk not ok'
+        'Disk not ok',
+        DEBUG_DUMP
     )
     
     # Get list of disks marked for replacement
-    replace_file, command_str = command(
+    replace_output, replace_command = command(
         COMMAND_CONFIG['replace'], 
         FILE_PATHS['replace_pdisk'], 
-        'List of replace disks'
+        'List of replace disks',
+        DEBUG_DUMP
     )
 
     # Process and display disks with issues
-    not_ok_df = get_failed_pdisk(not_ok_file, command_str)
-    disk_not_ok = display_state(not_ok_df, 'List of Disks that are not ok')
+    not_ok_rows = get_failed_pdisk(not_ok_output, not_ok_command)
+    disk_not_ok = display_state(not_ok_rows, 'List of Disks that are not ok')
     
     # Process and display disks that need replacement
-    replace_df = get_failed_pdisk(replace_file, command_str)
-    need_replace = display_state(replace_df, 'List of disks needs replace')
+    replace_rows = get_failed_pdisk(replace_output, replace_command)
+    need_replace = display_state(replace_rows, 'List of disks needs replace')
 
     print('\n\n')
     print("DISKS NEEDS REPLACEMENT!")
@@ -492,18 +612,33 @@ def main(args):
     
     # Build and log the command
     replace_cmd = ' '.join([str(elem) for elem in COMMAND_CONFIG['replace']])
-    commands.append(replace_cmd)
-    cmd_info = f"List of pdisk needs to be replaced:\n Command: {commands}\n{replace_df}\n\t\t"
+    commands = [replace_cmd]
+    cmd_info = f"List of pdisk needs to be replaced:\n Command: {commands}\n{replace_rows}\n\t\t"
     print(cmd_info)
     logging.info(cmd_info)
 
     # Process each disk that needs replacement
-    for index, row in replace_df.iterrows():
-        if '--------' not in row['recovery group'] and '--------' not in row['pdisk']:
-            pdisk = row['pdisk']
-            group = row['recovery group']
-            replace_pdisk(args, pdisk, group, need_replace)
-            get_pdisk_info(pdisk, group)
+    executed = False
+    for group, pdisk in replace_rows:
+        command_parts = build_replace_command(pdisk, group, prepare=not args['--replace'])
+        commands.append(' '.join(command_parts))
+
+        if args['--dryrun']:
+            # Just print the commands without executing
+            print(commands)
+        elif args['--prepare'] or args['--replace']:
+            execute_replace(command_parts, prepare=args['--prepare'])
+            executed = True
+
+    # Send a single notification for all disks
+    if args['--email'] and need_replace:
+        with MailSession(EMAIL_CONFIG['sender_email'], EMAIL_CONFIG['sender_password']) as session:
+            send_emails(session, args['<EMAIL>'], need_replace)
+
+    # Refresh the cached details once so they reflect the replacement actions
+    if executed:
+        fetch_all_pdisk_details(refresh=True)
+    list_pdisk = [get_pdisk_info(pdisk, group) for group, pdisk in replace_rows]
 
     # Create output file with collected disk information
     create_file(